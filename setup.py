@@ -20,6 +20,7 @@ VERSION = tia.__version__
 URL = "https://github.com/kavehtehrani/tia"
 REQUIRED = ['pandas', 'numpy']
 REQUIRED_FOR_TESTS = []
+EXTRAS_REQUIRED = {'cache': ['diskcache']}
 
 LONG_DESC = """\
 Bloomberg wrapper providing easy access to common tasks, supports both local terminal 
@@ -31,6 +32,7 @@ setuptools.setup(
     description=PACKAGE_DESC,
     include_package_data=True,
     install_requires=REQUIRED,
+    extras_require=EXTRAS_REQUIRED,
     long_description=LONG_DESC,
     name=PACKAGE,
     packages=['tia', 'tia.analysis', 'tia.bbg', 'tia.rlab', 'tia.tests',
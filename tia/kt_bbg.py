@@ -7,17 +7,146 @@ Kaveh Tehrani (kavehtheblacksmith@gmail.com)
 """
 
 import pandas as pd
+import numpy as np
 import datetime
-import scipy.interpolate
-import datetime
+import dateutil.parser
 import tia.bbg
+import tia.util.log as log
 import re
-from functools import lru_cache
+import os
+import inspect
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from types import MappingProxyType
 from typing import Tuple, Union, List
 
+_SPLIT_RE = re.compile(r'(\d*\.\d+|\d+)')
+_TENOR_RE = re.compile(r'^(\d+(?:\.\d+)?)([DWMY])$', re.I)
+_MULT = {'D': 1/365, 'W': 1/52, 'M': 1/12, 'Y': 1.0}
+_MAX_HISTORICAL_WORKERS = 4
+
+logger = log.get_logger(__name__)
+
+# ensuring consistency of referring to fields across applications
+BBG_FIELD_MATCHING = MappingProxyType({ 'futures':
+                                            MappingProxyType({ 'bid': 'px_bid',
+                                                               'ask': 'px_ask',
+                                                               'mid': 'px_mid',
+                                                               'last': 'px_last',
+                                                               'settle': 'px_settle',
+                                                               'volume': 'volume',
+                                                               'open_interest': 'open_int',
+                                                               })
+                                        })
+
+
+def _call_key(str_name: str, args: tuple, kwargs: dict) -> tuple:
+    # ticker lists and indices are not hashable, key them on their contents
+    args = tuple(tuple(a) if isinstance(a, (list, pd.Index)) else a for a in args)
+    return str_name, args, tuple(sorted(kwargs.items()))
+
+
+def _log_prefetch_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning('prefetch failed: %r' % future.exception())
+
+
+def coalesce(func):
+    """
+    share a single in-flight bloomberg request between threads asking for the same arguments, so that concurrent
+    lru_cache misses only hit bloomberg once
+    """
+    @wraps(func)
+    def _wrapper(self, *args, **kwargs):
+        key = _call_key(func.__name__, args, kwargs)
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            b_owner = future is None
+            if b_owner:
+                future = self._inflight[key] = Future()
+
+        if not b_owner:
+            return future.result()
+
+        try:
+            ret_val = func(self, *args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(ret_val)
+            return ret_val
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    # keep the lru_cache controls reachable from the public method
+    for str_attr in ('cache_clear', 'cache_info'):
+        if hasattr(func, str_attr):
+            setattr(_wrapper, str_attr, getattr(func, str_attr))
+
+    return _wrapper
+
+
+_MISSING = object()
+
+
+def disk_cached(str_date_arg: str):
+    """
+    second cache tier on disk for bloomberg data that can no longer change, results are only persisted when the
+    str_date_arg argument is a date before today. only active when BBG is created with str_cache_dir.
+    """
+    def _decorator(func):
+        sig = inspect.signature(func)
+
+        @wraps(func)
+        def _wrapper(self, *args, **kwargs):
+            if self._disk_cache is None:
+                return func(self, *args, **kwargs)
+
+            bound = sig.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            dt_key = _to_bbg_date(bound.arguments[str_date_arg])
+            if dt_key is None or dt_key >= datetime.date.today().strftime('%Y%m%d'):
+                return func(self, *args, **kwargs)
+
+            # key on the canonical date so equivalent date formats share an entry
+            bound.arguments[str_date_arg] = dt_key
+            key = (func.__name__,) + tuple(bound.arguments.items())[1:]
+            ret_val = self._disk_cache.get(key, default=_MISSING)
+            if ret_val is _MISSING:
+                ret_val = func(self, *args, **kwargs)
+                self._disk_cache.set(key, ret_val)
+            return ret_val
+
+        return _wrapper
+
+    return _decorator
+
+
+def cached_by(*str_cached):
+    """
+    public methods that normalize their arguments and defer to private lru_cached ones get cache_clear/cache_info
+    pointing at those caches. cache_info reports the first one.
+    """
+    def _decorator(func):
+        def cache_clear():
+            for str_name in str_cached:
+                getattr(BBG, str_name).cache_clear()
+
+        func.cache_clear = cache_clear
+        func.cache_info = lambda: getattr(BBG, str_cached[0]).cache_info()
+        return func
+
+    return _decorator
+
 
 class BBG:
-    def __init__(self, host='localhost', port=8194, bpipe=False, str_bpipeappname=''):
+    # instance state is fixed, no per instance __dict__
+    __slots__ = ('dm', '_inflight', '_inflight_lock', '_executor', '_disk_cache')
+
+    def __init__(self, host='localhost', port=8194, bpipe=False, str_bpipeappname='', str_cache_dir=None):
         if bpipe:
             if not host:
                 raise ValueError('Need to pass in the IP address of the bpipe terminal.')
@@ -26,22 +155,67 @@ class BBG:
         else:
             self.dm = tia.bbg.v3api.Terminal(host=host, port=port)
 
-    @lru_cache()
-    def get_futures_curve(self, str_ticker: str, b_include_historical: bool = False) -> pd.DataFrame:
-        # futures curve for a ticker (CT)
+        # requests currently being fetched, see coalesce. the prefetch executor is created on first use
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._executor = None
+
+        # optional on-disk cache of historical data that survives restarts, see disk_cached
+        if str_cache_dir:
+            import diskcache
+            self._disk_cache = diskcache.Cache(os.path.expanduser(str_cache_dir))
+        else:
+            self._disk_cache = None
+
+    def prefetch(self, func, *args, **kwargs) -> Union[Future, None]:
+        """
+        start func(*args, **kwargs) in the background when the caller already knows what it will ask for next, so the
+        bloomberg round trip overlaps with its own processing. meant for the cached methods: the result lands in their
+        cache, and for the coalesced ones a matching call made while it is still running waits on it. failures are
+        logged. bpipe keeps session state on the terminal so nothing is prefetched there and None is returned.
+        """
+        if self.dm.b_bpipe:
+            return None
+
+        with self._inflight_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2)
+
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(_log_prefetch_error)
+        return future
+
+    # cache sizes are per method and sized on what a single entry holds: full historical frames can run to several
+    # MB each so only a few dozen are kept, scalar lookups are cheap and get a much larger cache. note the caches are
+    # class level and hold a reference to self, so a BBG instance stays alive as long as it has cached entries.
+    @cached_by('_get_futures_curve')
+    def get_futures_curve(self, str_ticker: str, b_include_historical: bool = False,
+                          as_of: Union[pd.Timestamp, datetime.date, str] = None) -> pd.DataFrame:
+        # futures curve for a ticker (CT), days_to_expiry is measured from as_of (default today). the date is
+        # resolved here so every format of the same day shares one cache entry.
+        as_of = _to_bbg_date(datetime.date.today() if as_of is None else as_of)
+        return self._get_futures_curve(str_ticker, b_include_historical, as_of)
+
+    @coalesce
+    @lru_cache(maxsize=128)
+    def _get_futures_curve(self, str_ticker: str, b_include_historical: bool, as_of: str) -> pd.DataFrame:
+        as_of = pd.Timestamp(as_of)
+
         futures_curve = self.dm.get_reference_data(str_ticker, 'fut_chain',
             'include_expired_contracts=Y' if b_include_historical else None).as_frame().iloc[0].loc['fut_chain']
 
         futures_curve = self.dm.get_reference_data(futures_curve.iloc[:, 0], ['fut_month_yr', 'last_tradeable_dt']).as_frame()
-        futures_curve['month'] = futures_curve.iloc[:, 0].map(lambda x: datetime.datetime.strptime(x, '%b %y').month)
-        futures_curve['year'] = futures_curve.iloc[:, 0].map(lambda x: datetime.datetime.strptime(x, '%b %y').year)
-        futures_curve['days_to_expiry'] = (futures_curve['last_tradeable_dt'] - pd.Timestamp.now()).dt.days
+        # parse the contract month once for the whole chain rather than per row
+        contract_month = pd.to_datetime(futures_curve.iloc[:, 0], format='%b %y', cache=True)
+        futures_curve['month'] = contract_month.dt.month
+        futures_curve['year'] = contract_month.dt.year
+        futures_curve['days_to_expiry'] = (futures_curve['last_tradeable_dt'] - as_of).dt.days
 
         futures_curve = futures_curve.sort_values('last_tradeable_dt')
 
         return futures_curve
 
-    @lru_cache()
+    @lru_cache(maxsize=128)
     def get_option_futures_chain(self, str_ticker: str)  -> pd.DataFrame:
         opt_futures_curve = self.dm.get_reference_data(str_ticker, 'opt_futures_chain_dates').as_frame()\
             .iloc[0].loc['opt_futures_chain_dates']
@@ -97,39 +271,68 @@ class BBG:
             raise TypeError(f'{str_type} is not currently implemented.')
 
         dict_fields.update(dict_append)
-        option_ret = pd.DataFrame(index=[str_ticker])
-        option_ret = self.dm.get_reference_data(str_ticker, dict_fields).as_frame()
-        option_ret.rename(columns=dict_fields, inplace=True)
-
-        # adjustments and new additions
-        if 'cont_month_year' in option_ret.columns:
-            option_ret['month'] = option_ret['cont_month_year'].map(lambda x: datetime.datetime.strptime(x, '%b %y').month)
-            option_ret['year'] = option_ret['cont_month_year'].map(lambda x: datetime.datetime.strptime(x, '%b %y').year)
+        option_ret = self.dm.get_reference_data(str_ticker, list(dict_fields)).as_frame().rename(columns=dict_fields)
 
+        # adjustments and new additions, applied in a single assign
         # take out COMB out of the bbg ticker
-        option_ret['underlying_ticker'] = option_ret['underlying_ticker'].apply(lambda x: x.replace(' COMB', ''))
+        dict_new = {'underlying_ticker': option_ret['underlying_ticker'].str.replace(' COMB', '', regex=False).values}
+        if 'cont_month_year' in option_ret.columns:
+            contract_month = pd.to_datetime(option_ret['cont_month_year'], format='%b %y', cache=True)
+            dict_new['month'] = contract_month.dt.month.values
+            dict_new['year'] = contract_month.dt.year.values
 
-        return option_ret
+        return option_ret.assign(**dict_new)
 
-    @lru_cache()
+    @cached_by('_get_general_fields')
     def get_general_fields(self, str_ticker: str, str_fields: Tuple = ('px_last'),
                            ignore_security_error=0, ignore_field_error=0, **overrides) -> pd.DataFrame:
+        tickers, fields = _as_tuple(str_ticker), _as_tuple(str_fields)
+        df_ret = self._get_general_fields(_normalize_tickers(tickers), _normalize_fields(fields), **overrides)
 
-        return self.dm.get_reference_data(str_ticker, str_fields,
-                                          ignore_security_error=0, ignore_field_error=0, **overrides).as_frame()
+        # back to the order and field names the caller asked for
+        df_ret = df_ret.reindex(index=list(dict.fromkeys(tickers)), columns=[f.lower() for f in dict.fromkeys(fields)])
+        df_ret.columns = list(dict.fromkeys(fields))
+        return df_ret
 
+    @coalesce
     @lru_cache()
+    def _get_general_fields(self, str_tickers: Tuple[str, ...], str_fields: Tuple[str, ...],
+                            **overrides) -> pd.DataFrame:
+        return self.dm.get_reference_data(list(str_tickers), list(str_fields),
+                                          ignore_security_error=0, ignore_field_error=0, **overrides).as_frame()
+
+    @lru_cache(maxsize=1024)
     def get_general_field_single(self, str_ticker: str, str_field: str) -> pd.DataFrame:
-        ret_val = self.dm.get_reference_data(str_ticker, str_field).as_frame().iloc[0, 0]
+        return self.get_general_fields_batch((str_ticker,), str_field)[str_ticker]
+
+    def get_general_fields_batch(self, str_tickers: Union[Tuple, List, str], str_field: str) -> dict:
+        """
+        single field for several tickers in one request, returned as {ticker: value}
+        """
+        tickers = _as_tuple(str_tickers)
+        ret_val = self._get_general_fields_batch(_normalize_tickers(tickers), str_field)
+        # a new dict every call, so callers cannot change the cached values
+        return ret_val.reindex(list(dict.fromkeys(tickers))).to_dict()
+
+    @lru_cache(maxsize=128)
+    def _get_general_fields_batch(self, str_tickers: Tuple[str, ...], str_field: str) -> pd.Series:
+        ret_val = self.dm.get_reference_data(list(str_tickers), str_field).as_frame().iloc[:, 0]
         if str_field.lower() == 'underlying_security_des':
-            ret_val = ret_val.replace(' COMB', '')
+            ret_val = ret_val.str.replace(' COMB', '', regex=False)
         return ret_val
 
-    @lru_cache()
+    @cached_by('_get_historical_quick')
     def get_historical_quick(self, str_tickers: Union[Tuple, str], str_fields=('px_last'),
                              dt_beg: Union[datetime.datetime, str] = None,
                              dt_end: Union[datetime.datetime, str] = None) -> pd.DataFrame:
-        df_ret = self.dm.get_historical(str_tickers, str_fields, dt_beg, dt_end).as_frame()
+        tickers, fields = _as_tuple(str_tickers), _as_tuple(str_fields)
+        df_ret = self._get_historical_quick(_normalize_tickers(tickers), _normalize_fields(fields),
+                                            _to_bbg_date(dt_beg), _to_bbg_date(dt_end))
+
+        # back to the order and field names the caller asked for
+        tickers, fields = list(dict.fromkeys(tickers)), list(dict.fromkeys(fields))
+        df_ret = df_ret.reindex(columns=pd.MultiIndex.from_product([tickers, [f.lower() for f in fields]]))
+        df_ret.columns = pd.MultiIndex.from_product([tickers, fields])
 
         # if only one security, drop multiindex
         if isinstance(str_tickers, str):
@@ -137,90 +340,175 @@ class BBG:
 
         return df_ret
 
-    @lru_cache()
+    @coalesce
+    @lru_cache(maxsize=64)
+    @disk_cached('dt_end')
+    def _get_historical_quick(self, str_tickers: Tuple[str, ...], str_fields: Tuple[str, ...],
+                              dt_beg: str = None, dt_end: str = None) -> pd.DataFrame:
+        return self._get_historical_frame(list(str_tickers), list(str_fields), dt_beg, dt_end)
+
+    @cached_by('_get_historical_quick_single')
     def get_historical_quick_single(self, str_tickers: Union[Tuple, str], str_fields: Union[Tuple, str],
                                     dt_tgt: Union[datetime.datetime, str]):
-        return self.dm.get_historical(str_tickers, str_fields, dt_tgt, dt_tgt).as_frame().iloc[0, 0]
-
-    @lru_cache()
-    def convert_bbg_tenor_tag(self, str_tag: str) -> str:
-        (num, letter) = split_letters_numbers(str_tag)
-        num = int(num)
-
-        if letter.lower() == 'd':           mult = 1/365
-        elif letter.lower() == 'w':         mult = 1/52
-        elif letter.lower() == 'm':         mult = 1/12
-        elif letter.lower() == 'y':         mult = 1
-        else:                               raise(TypeError('cannot find appropriate letter for tenor'))
-
-        return num*mult
+        tickers, fields = _as_tuple(str_tickers), _as_tuple(str_fields)
+        df_ret = self._get_historical_quick_single(_normalize_tickers(tickers), _normalize_fields(fields),
+                                                   _to_bbg_date(dt_tgt))
+        return df_ret[(tickers[0], fields[0].lower())].iloc[0]
+
+    @lru_cache(maxsize=512)
+    @disk_cached('dt_tgt')
+    def _get_historical_quick_single(self, str_tickers: Tuple[str, ...], str_fields: Tuple[str, ...],
+                                     dt_tgt: str) -> pd.DataFrame:
+        return self.dm.get_historical(list(str_tickers), list(str_fields), dt_tgt, dt_tgt).as_frame()
+
+    @lru_cache(maxsize=1024)
+    def convert_bbg_tenor_tag(self, str_tag: str) -> float:
+        # same parsing as the tenor column in _load_ois_curve
+        match = _TENOR_RE.match(str_tag)
+        if match is None:
+            raise TypeError('cannot find appropriate letter for tenor')
+
+        return float(match.group(1)) * _MULT[match.group(2).upper()]
 
     def get_historical(self, sids: Union[List, Tuple, str], fields: Union[List, Tuple, str],
                        dt_beg: Union[datetime.datetime, str], dt_end: Union[datetime.datetime, str],
                        period: str = 'DAILY', **overrides):
 
-        df_ret = self.dm.get_historical(sids, fields, dt_beg, dt_end, period,
-                                        ignore_security_error=0, ignore_field_error=0, **overrides).as_frame()
+        df_ret = self._get_historical_frame(sids, fields, dt_beg, dt_end, period,
+                                            ignore_security_error=0, ignore_field_error=0, **overrides)
 
         return df_ret
 
-    @lru_cache()
+    def _get_historical_frame(self, sids, fields, dt_beg, dt_end, period=None, **overrides) -> pd.DataFrame:
+        # multi-year daily requests are split by calendar year and fetched in parallel, each request opens its own
+        # session so this is safe on a local terminal. bpipe keeps session state on the terminal and re-authorizes on
+        # every request, so it always gets a single request.
+        dt_beg, dt_end = _to_bbg_date(dt_beg), _to_bbg_date(dt_end)
+        if self.dm.b_bpipe or dt_beg is None or dt_end is None or (period or 'DAILY') != 'DAILY' \
+                or dt_beg[:4] >= dt_end[:4] or overrides.get('max_data_points'):
+            return self.dm.get_historical(sids, fields, dt_beg, dt_end, period, **overrides).as_frame()
+
+        chunks = [(max(dt_beg, f'{year}0101'), min(dt_end, f'{year}1231'))
+                  for year in range(int(dt_beg[:4]), int(dt_end[:4]) + 1)]
+        with ThreadPoolExecutor(max_workers=min(len(chunks), _MAX_HISTORICAL_WORKERS)) as executor:
+            frames = list(executor.map(
+                lambda chunk: self.dm.get_historical(sids, fields, chunk[0], chunk[1], period, **overrides).as_frame(),
+                chunks))
+
+        # years with no data come back without a date index, leave them out of the stitched frame
+        frames = [f for f in frames if not f.empty] or frames[:1]
+        return pd.concat(frames, axis=0)
+
+    @cached_by('_get_ois', '_load_ois_curve', '_get_ois_spline')
     def get_ois(self, date: Union[datetime.datetime, str], tgt_tenor: float,
                 str_currency: str = 'usd', num_side: str = 'mid') -> Tuple[float, pd.DataFrame]:
+        ret_rate, ret_curve = self._get_ois(_to_bbg_date(date), tgt_tenor, str_currency, num_side)
 
+        # the curve is shared by every cached lookup on this date, hand out a copy
+        return ret_rate, ret_curve.copy()
+
+    @coalesce
+    @lru_cache()
+    @disk_cached('date')
+    def _get_ois(self, date: str, tgt_tenor: float, str_currency: str, num_side: str) -> Tuple[float, pd.DataFrame]:
         # see if it exists in
         if str_currency.lower() == 'usd':       str_curve = 'YCSW0042 Index'
         elif str_currency.lower() == 'eur':     str_curve = 'YCSW0133 Index'
         elif str_currency.lower() == 'gbp':     str_curve = 'YCSW0141 Index'
         elif str_currency.lower() == 'cad':     str_curve = 'YCSW0147 Index'
 
-        if type(date) is not str:
-            date = date.strftime('%Y%m%d')
+        ret_curve = self._load_ois_curve(str_curve, date)
 
+        # interploate for the target rate, flat below the shortest tenor
+        tenors = ret_curve['tenor'].to_numpy()
+        idx_min = tenors.argmin()
+        if tgt_tenor < tenors[idx_min]:
+            ret_rate = float(ret_curve[num_side].iat[idx_min])
+        else:
+            ret_rate = self._get_ois_spline(str_curve, date, num_side)(tgt_tenor)
+            if np.isnan(ret_rate):
+                raise ValueError(f'target tenor {tgt_tenor} is beyond the longest tenor on the {str_curve} curve')
+        return ret_rate, ret_curve
+
+    @lru_cache(maxsize=128)
+    def _load_ois_curve(self, str_curve: str, date: str) -> pd.DataFrame:
         d = self.dm.get_reference_data(str_curve, 'curve_tenor_rates', curve_date=date).as_frame()
         ret_curve = d.loc[d.index[0], 'curve_tenor_rates']
         ret_curve.rename(columns={'Tenor': 'tenor', 'Tenor Ticker': 'ticker', 'Ask Yield': 'ask', 'Mid Yield': 'mid',
                                   'Bid Yield': 'bid', 'Last Update': 'last_update'}, inplace=True)
 
-        # convert the bbg indicator to years
-        ret_curve['tenor']  = [ self.convert_bbg_tenor_tag(l) for l in ret_curve['tenor'] ]
+        # convert the bbg indicator to years, for the whole column at once
+        ext = ret_curve['tenor'].str.extract(_TENOR_RE)
+        if ext.isnull().any().any():
+            raise TypeError('cannot find appropriate letter for tenor')
+        ret_curve['tenor'] = ext[0].astype(float).values * ext[1].str.upper().map(_MULT).values
 
-        # interploate for the target rate
-        if tgt_tenor < min(ret_curve['tenor']):
-            ret_rate = float(ret_curve[ret_curve['tenor'] == min(ret_curve['tenor'])][num_side])
-        else:
-            ret_rate = scipy.interpolate.interp1d(list(ret_curve['tenor']),
-                                                  list(ret_curve[num_side]),
-                                                  kind='cubic')(tgt_tenor)
-        return ret_rate, ret_curve
+        # the spline needs strictly increasing knots
+        ret_curve = ret_curve.sort_values('tenor')
+        if not ret_curve['tenor'].is_unique:
+            raise ValueError(f'duplicate tenors on the {str_curve} curve for {date}')
+
+        return ret_curve
+
+    @lru_cache()
+    def _get_ois_spline(self, str_curve: str, date: str, num_side: str) -> 'scipy.interpolate.CubicSpline':
+        # one spline per curve/date/side, reused for every target tenor. scipy is slow to import and only needed
+        # here, so load it on first use
+        from scipy.interpolate import CubicSpline
+
+        ret_curve = self._load_ois_curve(str_curve, date)
+        return CubicSpline(ret_curve['tenor'].to_numpy(dtype=np.float64),
+                           ret_curve[num_side].to_numpy(dtype=np.float64), extrapolate=False)
 
     @lru_cache()
     def get_options_underlying(self, str_ticker: str) -> str:
         return self.dm.get_reference_data(str_ticker, 'opt_undl_ticker').as_frame().iloc[0].loc['opt_undl_ticker']
 
-    # ensuring consistency of referring to fields across applications
-    bbg_field_matching = { 'futures':
-                               { 'bid': 'px_bid',
-                                 'ask': 'px_ask',
-                                 'mid': 'px_mid',
-                                 'last': 'px_last',
-                                 'settle': 'px_settle',
-                                 'volume': 'volume',
-                                 'open_interest': 'open_int',
-                                 }
-                           }
+    # kept on the class for existing callers, see BBG_FIELD_MATCHING
+    bbg_field_matching = BBG_FIELD_MATCHING
+
+
+@lru_cache(maxsize=1024)
+def split_letters_numbers(str_in: str) -> Tuple[str, ...]:
+    # cached, so hand back a tuple that callers cannot mutate
+    return tuple(p for p in _SPLIT_RE.split(str_in) if p)
+
+
+def _as_tuple(x: Union[Tuple, List, str]) -> Tuple[str, ...]:
+    return (x,) if isinstance(x, str) else tuple(x)
+
+
+def _normalize_tickers(str_tickers: Union[Tuple, List, str]) -> Tuple[str, ...]:
+    # canonical form of a ticker argument so equivalent requests share a cache entry. case is kept as bloomberg
+    # echoes the security back exactly as it was sent
+    return tuple(sorted(set(_as_tuple(str_tickers))))
+
+
+def _normalize_fields(str_fields: Union[Tuple, List, str]) -> Tuple[str, ...]:
+    # canonical form of a field argument, bloomberg field mnemonics are case insensitive
+    return tuple(sorted({f.lower() for f in _as_tuple(str_fields)}))
+
 
+def _to_bbg_date(dt_in: Union[datetime.date, str, None]) -> Union[str, None]:
+    # bloomberg wants yyyymmdd, only parse when the caller did not already pass that in
+    if dt_in is None:
+        return None
+    if isinstance(dt_in, (datetime.date, datetime.datetime)):
+        return dt_in.strftime('%Y%m%d')
 
-def split_letters_numbers(str_in):
-    ret = re.split(r'(\d*\.\d+|\d+)', str_in)
-    if '' in ret:
-        ret.remove('')
-    return ret
+    dt_in = str(dt_in)
+    if len(dt_in) == 8 and dt_in.isdigit():
+        return dt_in
+    try:
+        dt_out = datetime.datetime.fromisoformat(dt_in)
+    except ValueError:
+        dt_out = dateutil.parser.parse(dt_in)
+    return dt_out.strftime('%Y%m%d')
 
 
 def insert_year_into_ticker(str_ticker: str, str_year: str) -> str:
     str_year = str(str_year)
-    mod_ticker = split_letters_numbers(str_ticker)
+    mod_ticker = list(split_letters_numbers(str_ticker))
     if len(mod_ticker) < 3:
         raise IOError('the ticker passed in needs to conform to bbg standards.')
     if not mod_ticker[1].isdigit():